@@ -4,11 +4,23 @@ Dependencies for Driver Service
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
+from bson import ObjectId
+import redis.asyncio as aioredis
+from cachetools import TTLCache
+from typing import Optional
+import asyncio
+import hashlib
 import jwt
 import logging
+import time
 
 from app.config import settings
+from app.services.delivery_service import (
+    DeliveryService,
+    DRIVER_DELIVERIES_INDEX,
+    OPEN_DELIVERIES_INDEX
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,50 +30,133 @@ security = HTTPBearer()
 # Database clients
 _mongo_client = None
 _db = None
+_redis = None
+_index_task = None
+_delivery_service = None
+
+# Verified JWT payloads keyed by SHA-256 of the raw token
+_token_cache: TTLCache = TTLCache(maxsize=10000, ttl=30)
+_token_cache_lock = asyncio.Lock()
+
+# Roles allowed through require_driver
+_DRIVER_ROLES = frozenset({"driver", "admin"})
+
+# jwt.decode arguments, built once instead of per request
+_DECODE_KWARGS = {
+    "key": settings.jwt_secret,
+    "algorithms": [settings.jwt_algorithm],
+    "issuer": settings.jwt_issuer,
+    "audience": settings.jwt_audience,
+    "options": {"require": ["exp", "iss", "aud", "type", "sub"]},
+}
+
+
+async def ensure_indexes(db):
+    """Create indexes backing the delivery queries"""
+    try:
+        await db.deliveries.create_index(DRIVER_DELIVERIES_INDEX)
+        await db.deliveries.create_index(
+            OPEN_DELIVERIES_INDEX,
+            # Partial indexes can't filter on $exists: false, so scope to the open pool
+            partialFilterExpression={"status": "assigned"}
+        )
+        logger.info("MongoDB indexes ensured")
+    except Exception as e:
+        logger.error(f"Failed to create MongoDB indexes: {str(e)}")
 
 
 async def connect_db():
-    """Connect to MongoDB"""
-    global _mongo_client, _db
-    _mongo_client = AsyncIOMotorClient(settings.mongodb_uri)
+    """Connect to MongoDB and Redis"""
+    global _mongo_client, _db, _redis, _index_task, _delivery_service
+    _mongo_client = AsyncMongoClient(
+        settings.mongodb_uri,
+        minPoolSize=5,
+        maxPoolSize=50,
+        serverSelectionTimeoutMS=5000,
+        maxIdleTimeMS=60000,
+        compressors="zstd,zlib"
+    )
     _db = _mongo_client.get_default_database()
+    _delivery_service = DeliveryService(_db)
+    
+    # Force the initial handshake before the first request
+    await _mongo_client.admin.command("ping")
+    
+    # Build indexes in the background so startup isn't blocked
+    _index_task = asyncio.create_task(ensure_indexes(_db))
     logger.info("Connected to MongoDB")
+    
+    # Fail fast rather than hang every heartbeat on an unresponsive Redis
+    _redis = aioredis.from_url(
+        settings.redis_uri,
+        socket_connect_timeout=1,
+        socket_timeout=1
+    )
+    logger.info("Connected to Redis")
 
 
 async def disconnect_db():
-    """Disconnect from MongoDB"""
-    global _mongo_client
+    """Disconnect from MongoDB and Redis"""
+    global _mongo_client, _redis
+    if _index_task and not _index_task.done():
+        _index_task.cancel()
     if _mongo_client:
-        _mongo_client.close()
+        await _mongo_client.close()
         logger.info("Disconnected from MongoDB")
+    if _redis:
+        await _redis.aclose()
+        logger.info("Disconnected from Redis")
 
 
-def get_database():
+async def get_database():
     """Get database instance"""
     return _db
 
 
+async def get_redis():
+    """Get Redis client"""
+    return _redis
+
+
+async def get_delivery_service() -> DeliveryService:
+    """Get the shared delivery service instance"""
+    return _delivery_service
+
+
+def get_cached_token_payload(key: bytes) -> Optional[dict]:
+    """Return a previously verified payload if it has not expired"""
+    payload = _token_cache.get(key)
+    if payload and payload.get("exp", 0) > time.time():
+        return payload
+    return None
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """Validate JWT token and return user data"""
     token = credentials.credentials
+    key = hashlib.sha256(token.encode()).digest()
+    
+    payload = get_cached_token_payload(key)
+    if payload:
+        return payload
     
     try:
-        payload = jwt.decode(
-            token,
-            settings.jwt_secret,
-            algorithms=[settings.jwt_algorithm],
-            issuer=settings.jwt_issuer,
-            audience=settings.jwt_audience
-        )
+        payload = jwt.decode(token, **_DECODE_KWARGS)
         
-        if payload.get("type") != "access":
+        # "type" is guaranteed present by the require option
+        if payload["type"] != "access":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token type"
             )
         
+        payload["_roles_set"] = frozenset(payload.get("roles", ()))
+        
+        async with _token_cache_lock:
+            _token_cache[key] = payload
+        
         return payload
         
     except jwt.ExpiredSignatureError:
@@ -78,10 +173,14 @@ async def get_current_user(
 
 async def require_driver(user: dict = Depends(get_current_user)) -> dict:
     """Require driver role"""
-    roles = user.get("roles", [])
-    if "driver" not in roles and "admin" not in roles:
+    if not (_DRIVER_ROLES & user["_roles_set"]):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Driver access required"
         )
+    
+    # Parse the subject once; the payload dict is reused from the token cache
+    if "_sub_oid" not in user:
+        user["_sub_oid"] = ObjectId(user["sub"])
+    
     return user
@@ -2,8 +2,8 @@
 Delivery models for Driver Service
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from typing import Annotated, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -17,11 +17,15 @@ class DeliveryStatus(str, Enum):
 
 
 class Location(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     lat: float = Field(ge=-90, le=90)
     lon: float = Field(ge=-180, le=180)
 
 
 class DeliveryStatusUpdate(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     status: DeliveryStatus
     lat: Optional[float] = Field(default=None, ge=-90, le=90)
     lon: Optional[float] = Field(default=None, ge=-180, le=180)
@@ -29,10 +33,14 @@ class DeliveryStatusUpdate(BaseModel):
 
 
 class DeliveryOTPConfirm(BaseModel):
-    otp: str = Field(pattern=r'^\d{6}$')
+    model_config = ConfigDict(frozen=True)
+    
+    otp: Annotated[str, StringConstraints(pattern=r'^\d{6}$')]
 
 
 class DeliveryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     id: str
     order_id: str
     driver_id: Optional[str] = None
@@ -41,6 +49,3 @@ class DeliveryResponse(BaseModel):
     pickup_at: Optional[datetime] = None
     delivered_at: Optional[datetime] = None
     current_location: Optional[dict] = None
-    
-    class Config:
-        from_attributes = True
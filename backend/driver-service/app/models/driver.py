@@ -2,23 +2,25 @@
 Driver models for Driver Service
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 
 
 class DriverProfile(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     id: str
     name: str
     phone: str
     email: Optional[str] = None
     is_verified: bool
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
 
 
 class LocationUpdate(BaseModel):
-    lat: float = Field(ge=-90, le=90)
+    model_config = ConfigDict(frozen=True)
+    
+    # Redis GEOADD only takes Web Mercator latitudes, so reject the rest as a 422
+    lat: float = Field(ge=-85.05112878, le=85.05112878)
     lon: float = Field(ge=-180, le=180)
@@ -5,7 +5,7 @@ Deliveries Router for Driver Service
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import Optional
 
-from app.dependencies import require_driver, get_database
+from app.dependencies import require_driver, get_delivery_service
 from app.models.delivery import DeliveryStatusUpdate, DeliveryOTPConfirm
 from app.services.delivery_service import DeliveryService
 
@@ -18,18 +18,16 @@ async def list_deliveries(
     available: bool = False,
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
-    user: dict = Depends(require_driver)
+    user: dict = Depends(require_driver),
+    service: DeliveryService = Depends(get_delivery_service)
 ):
     """List deliveries for the driver"""
-    db = get_database()
-    service = DeliveryService(db)
-    
     if available:
         # Get available deliveries that are not yet assigned
         result = await service.get_available_deliveries(page, size)
     else:
         # Get driver's deliveries
-        result = await service.get_deliveries(user["sub"], status, page, size)
+        result = await service.get_deliveries(user["_sub_oid"], status, page, size)
     
     return {"success": True, "data": result}
 
@@ -37,12 +35,10 @@ async def list_deliveries(
 @router.get("/deliveries/{delivery_id}")
 async def get_delivery(
     delivery_id: str,
-    user: dict = Depends(require_driver)
+    user: dict = Depends(require_driver),
+    service: DeliveryService = Depends(get_delivery_service)
 ):
     """Get delivery details"""
-    db = get_database()
-    service = DeliveryService(db)
-    
     delivery = await service.get_delivery(delivery_id)
     
     if not delivery:
@@ -57,13 +53,11 @@ async def get_delivery(
 @router.post("/deliveries/{delivery_id}/accept")
 async def accept_delivery(
     delivery_id: str,
-    user: dict = Depends(require_driver)
+    user: dict = Depends(require_driver),
+    service: DeliveryService = Depends(get_delivery_service)
 ):
     """Accept a delivery"""
-    db = get_database()
-    service = DeliveryService(db)
-    
-    delivery = await service.accept_delivery(delivery_id, user["sub"])
+    delivery = await service.accept_delivery(delivery_id, user["_sub_oid"])
     
     if not delivery:
         raise HTTPException(
@@ -78,19 +72,17 @@ async def accept_delivery(
 async def update_delivery_status(
     delivery_id: str,
     update: DeliveryStatusUpdate,
-    user: dict = Depends(require_driver)
+    user: dict = Depends(require_driver),
+    service: DeliveryService = Depends(get_delivery_service)
 ):
     """Update delivery status and location"""
-    db = get_database()
-    service = DeliveryService(db)
-    
     location = None
     if update.lat is not None and update.lon is not None:
         location = {"lat": update.lat, "lon": update.lon}
     
     delivery = await service.update_status(
         delivery_id,
-        user["sub"],
+        user["_sub_oid"],
         update.status.value,
         location,
         update.notes
@@ -109,13 +101,11 @@ async def update_delivery_status(
 async def confirm_delivery(
     delivery_id: str,
     otp_data: DeliveryOTPConfirm,
-    user: dict = Depends(require_driver)
+    user: dict = Depends(require_driver),
+    service: DeliveryService = Depends(get_delivery_service)
 ):
     """Confirm delivery with OTP"""
-    db = get_database()
-    service = DeliveryService(db)
-    
-    result = await service.confirm_delivery(delivery_id, user["sub"], otp_data.otp)
+    result = await service.confirm_delivery(delivery_id, user["_sub_oid"], otp_data.otp)
     
     if not result["success"]:
         raise HTTPException(
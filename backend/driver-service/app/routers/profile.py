@@ -3,21 +3,44 @@ Profile Router for Driver Service
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from bson import ObjectId
-from datetime import datetime
+from pymongo.asynchronous.database import AsyncDatabase
+from redis.asyncio import Redis
+import asyncio
+import time
 
-from app.dependencies import require_driver, get_database
+from app.dependencies import require_driver, get_database, get_redis
 from app.models.driver import LocationUpdate
 
 router = APIRouter()
 
 
 @router.get("/profile")
-async def get_profile(user: dict = Depends(require_driver)):
+async def get_profile(
+    user: dict = Depends(require_driver),
+    db: AsyncDatabase = Depends(get_database)
+):
     """Get driver profile"""
-    db = get_database()
+    # Completed vs in-progress counts in a single pass over the driver's deliveries
+    stats_pipeline = [
+        {"$match": {
+            "driver_id": user["_sub_oid"],
+            "status": {"$in": ["delivered", "assigned", "picked_up", "in_transit"]}
+        }},
+        {"$group": {
+            "_id": None,
+            "done": {"$sum": {"$cond": [{"$eq": ["$status", "delivered"]}, 1, 0]}},
+            "wip": {"$sum": {"$cond": [{"$eq": ["$status", "delivered"]}, 0, 1]}}
+        }}
+    ]
+    
+    async def get_stats() -> list:
+        cursor = await db.deliveries.aggregate(stats_pipeline)
+        return await cursor.to_list(1)
     
-    user_doc = await db.users.find_one({"_id": ObjectId(user["sub"])})
+    user_doc, stats = await asyncio.gather(
+        db.users.find_one({"_id": user["_sub_oid"]}),
+        get_stats()
+    )
     
     if not user_doc:
         raise HTTPException(
@@ -25,16 +48,7 @@ async def get_profile(user: dict = Depends(require_driver)):
             detail="User not found"
         )
     
-    # Get driver stats
-    deliveries_completed = await db.deliveries.count_documents({
-        "driver_id": ObjectId(user["sub"]),
-        "status": "delivered"
-    })
-    
-    deliveries_in_progress = await db.deliveries.count_documents({
-        "driver_id": ObjectId(user["sub"]),
-        "status": {"$in": ["assigned", "picked_up", "in_transit"]}
-    })
+    stats_doc = stats[0] if stats else {}
     
     return {
         "success": True,
@@ -49,8 +63,8 @@ async def get_profile(user: dict = Depends(require_driver)):
                 "created_at": user_doc.get("created_at")
             },
             "stats": {
-                "deliveries_completed": deliveries_completed,
-                "deliveries_in_progress": deliveries_in_progress
+                "deliveries_completed": stats_doc.get("done", 0),
+                "deliveries_in_progress": stats_doc.get("wip", 0)
             }
         }
     }
@@ -59,26 +73,15 @@ async def get_profile(user: dict = Depends(require_driver)):
 @router.put("/location")
 async def update_location(
     location: LocationUpdate,
-    user: dict = Depends(require_driver)
+    user: dict = Depends(require_driver),
+    redis: Redis = Depends(get_redis)
 ):
     """Update driver's current location"""
-    db = get_database()
-    
-    # Store location (could be in Redis for real-time tracking)
-    await db.driver_locations.update_one(
-        {"driver_id": ObjectId(user["sub"])},
-        {
-            "$set": {
-                "driver_id": ObjectId(user["sub"]),
-                "location": {
-                    "type": "Point",
-                    "coordinates": [location.lon, location.lat]
-                },
-                "updated_at": datetime.utcnow()
-            }
-        },
-        upsert=True
-    )
+    # Heartbeats are high-churn and low-durability, so keep them in Redis
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.geoadd("driver_locations", (location.lon, location.lat, user["sub"]))
+        pipe.hset(f"driver:{user['sub']}", "updated_at", time.time())
+        await pipe.execute()
     
     return {
         "success": True,
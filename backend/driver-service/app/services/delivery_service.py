@@ -3,47 +3,152 @@ Delivery Service for Driver
 """
 
 from bson import ObjectId
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from datetime import datetime
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import OperationFailure
 from typing import Optional
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Index key patterns, shared with ensure_indexes so query hints always match a real index
+DRIVER_DELIVERIES_INDEX = [("driver_id", 1), ("status", 1), ("assigned_at", -1)]
+OPEN_DELIVERIES_INDEX = [("status", 1), ("driver_id", 1), ("assigned_at", -1)]
+
+# Stages that stringify a delivery's ObjectId fields server-side, leaving a flat dict
+_STRINGIFY_IDS = [
+    {"$set": {
+        "id": {"$toString": "$_id"},
+        "order_id": {"$toString": "$order_id"},
+        "driver_id": {"$cond": [
+            {"$ifNull": ["$driver_id", False]},
+            {"$toString": "$driver_id"},
+            "$$REMOVE"
+        ]}
+    }},
+    {"$unset": "_id"}
+]
+
+# Fields returned from status-changing writes, already stringified for the response
+_DELIVERY_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "order_id": {"$toString": "$order_id"},
+    "driver_id": {"$toString": "$driver_id"},
+    "status": 1,
+    "assigned_at": 1,
+    "pickup_at": 1,
+    "delivered_at": 1,
+    "current_location": 1
+}
+
+# Strong references to in-flight background writes so they aren't garbage collected
+_background_tasks = set()
+
+
+def _log_task_result(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Background write failed: {str(task.exception())}")
+
+
+def _safe_task(coro) -> asyncio.Task:
+    """Run a coroutine in the background, logging any error it raises"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_log_task_result)
+    return task
+
+
+def _is_missing_hint(error: OperationFailure) -> bool:
+    """Whether a query failed only because its hint names an index that doesn't exist yet"""
+    message = (error.details or {}).get("errmsg", "")
+    return error.code == 2 and "hint provided does not correspond to an existing index" in message
+
 
 class DeliveryService:
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(self, db: AsyncDatabase):
         self.db = db
         self.deliveries = db.deliveries
         self.orders = db.orders
     
+    @staticmethod
+    def _page_pipeline(query: dict, skip: int, size: int, sort: Optional[dict]) -> list:
+        """Build the $facet pipeline for one page of deliveries and the total count"""
+        pipeline = [{"$match": query}]
+        
+        # Sort ahead of $facet, where an index can serve it. With a status filter the
+        # driver index yields assigned_at order; without one it can't, and the server
+        # falls back to an in-memory sort over the driver's deliveries.
+        if sort:
+            pipeline.append({"$sort": sort})
+        
+        pipeline.append(
+            {"$facet": {
+                "items": [
+                    {"$skip": skip},
+                    {"$limit": size},
+                    *_STRINGIFY_IDS
+                ],
+                "total": [{"$count": "n"}]
+            }}
+        )
+        
+        return pipeline
+    
+    async def _find_page(
+        self,
+        query: dict,
+        skip: int,
+        size: int,
+        hint: list,
+        sort: Optional[dict] = None
+    ) -> tuple:
+        """Fetch one page of deliveries and the total count in a single round trip"""
+        try:
+            cursor = await self.deliveries.aggregate(
+                self._page_pipeline(query, skip, size, sort),
+                hint=hint
+            )
+            doc = (await cursor.to_list(1))[0]
+        except OperationFailure as e:
+            if not _is_missing_hint(e):
+                raise
+            
+            # ensure_indexes runs in the background, so the hinted index may still be
+            # building or may have failed to build. Let the planner pick, and sort
+            # explicitly since index order no longer defines the page order.
+            logger.warning(f"Hinted index missing, retrying delivery query unhinted: {str(e)}")
+            cursor = await self.deliveries.aggregate(
+                self._page_pipeline(query, skip, size, sort or {"assigned_at": -1})
+            )
+            doc = (await cursor.to_list(1))[0]
+        
+        total = doc["total"][0]["n"] if doc["total"] else 0
+        
+        return doc["items"], total
+    
     async def get_deliveries(
         self, 
-        driver_id: str, 
+        driver_id: ObjectId, 
         status: Optional[str] = None,
         page: int = 1, 
         size: int = 20
     ) -> dict:
         """Get deliveries for a driver"""
-        query = {"driver_id": ObjectId(driver_id)}
+        query = {"driver_id": driver_id}
         
         if status:
             query["status"] = status
         
         skip = (page - 1) * size
         
-        cursor = self.deliveries.find(query).skip(skip).limit(size).sort("assigned_at", -1)
-        deliveries = await cursor.to_list(length=size)
-        
-        # Convert ObjectIds to strings
-        for delivery in deliveries:
-            delivery["id"] = str(delivery["_id"])
-            delivery["order_id"] = str(delivery["order_id"])
-            if delivery.get("driver_id"):
-                delivery["driver_id"] = str(delivery["driver_id"])
-            del delivery["_id"]
-        
-        total = await self.deliveries.count_documents(query)
+        # Pin the planner to the driver index so a rebuild can't flip it to a worse plan
+        deliveries, total = await self._find_page(
+            query, skip, size,
+            hint=DRIVER_DELIVERIES_INDEX,
+            sort={"assigned_at": -1}
+        )
         
         return {
             "deliveries": deliveries,
@@ -68,16 +173,13 @@ class DeliveryService:
         
         skip = (page - 1) * size
         
-        cursor = self.deliveries.find(query).skip(skip).limit(size).sort("assigned_at", -1)
-        deliveries = await cursor.to_list(length=size)
-        
-        # Convert ObjectIds
-        for delivery in deliveries:
-            delivery["id"] = str(delivery["_id"])
-            delivery["order_id"] = str(delivery["order_id"])
-            del delivery["_id"]
-        
-        total = await self.deliveries.count_documents(query)
+        # Drivers poll this constantly, so skip the explicit sort stage. Walking the
+        # open-pool index still yields newest-assigned first, but the order is
+        # only as stable as the index the planner is hinted to.
+        deliveries, total = await self._find_page(
+            query, skip, size,
+            hint=OPEN_DELIVERIES_INDEX
+        )
         
         return {
             "deliveries": deliveries,
@@ -90,30 +192,34 @@ class DeliveryService:
         }
     
     async def get_delivery(self, delivery_id: str) -> Optional[dict]:
-        """Get single delivery"""
-        delivery = await self.deliveries.find_one({"_id": ObjectId(delivery_id)})
-        
-        if delivery:
-            delivery["id"] = str(delivery["_id"])
-            delivery["order_id"] = str(delivery["order_id"])
-            if delivery.get("driver_id"):
-                delivery["driver_id"] = str(delivery["driver_id"])
-            del delivery["_id"]
-            
-            # Get order details
-            order = await self.orders.find_one({"_id": ObjectId(delivery["order_id"])})
-            if order:
-                delivery["order"] = {
-                    "id": str(order["_id"]),
-                    "total_amount": order.get("total_amount"),
-                    "status": order.get("status"),
-                    "shipping_address": order.get("shipping_address"),
-                    "items_count": len(order.get("items", []))
-                }
-        
-        return delivery
+        """Get single delivery with its order summary"""
+        pipeline = [
+            {"$match": {"_id": ObjectId(delivery_id)}},
+            {"$lookup": {
+                "from": "orders",
+                "localField": "order_id",
+                "foreignField": "_id",
+                "as": "order",
+                "pipeline": [
+                    {"$project": {
+                        "_id": 0,
+                        "id": {"$toString": "$_id"},
+                        "total_amount": 1,
+                        "status": 1,
+                        "shipping_address": 1,
+                        "items_count": {"$size": {"$ifNull": ["$items", []]}}
+                    }}
+                ]
+            }},
+            {"$unwind": {"path": "$order", "preserveNullAndEmptyArrays": True}},
+            *_STRINGIFY_IDS
+        ]
+        
+        results = await (await self.deliveries.aggregate(pipeline)).to_list(1)
+        
+        return results[0] if results else None
     
-    async def accept_delivery(self, delivery_id: str, driver_id: str) -> Optional[dict]:
+    async def accept_delivery(self, delivery_id: str, driver_id: ObjectId) -> Optional[dict]:
         """Accept a delivery"""
         result = await self.deliveries.find_one_and_update(
             {
@@ -122,19 +228,14 @@ class DeliveryService:
                 "driver_id": {"$exists": False}
             },
             {
-                "$set": {
-                    "driver_id": ObjectId(driver_id),
-                    "accepted_at": datetime.utcnow()
-                }
+                "$set": {"driver_id": driver_id},
+                "$currentDate": {"accepted_at": True}
             },
+            projection=_DELIVERY_PROJECTION,
             return_document=True
         )
         
         if result:
-            result["id"] = str(result["_id"])
-            result["order_id"] = str(result["order_id"])
-            result["driver_id"] = str(result["driver_id"])
-            del result["_id"]
             logger.info(f"Delivery accepted: {delivery_id} by driver {driver_id}")
         
         return result
@@ -142,7 +243,7 @@ class DeliveryService:
     async def update_status(
         self, 
         delivery_id: str, 
-        driver_id: str,
+        driver_id: ObjectId,
         status: str,
         location: Optional[dict] = None,
         notes: Optional[str] = None
@@ -158,27 +259,25 @@ class DeliveryService:
         if notes:
             update_data["notes"] = notes
         
-        # Set timestamp based on status
+        update = {"$set": update_data}
+        
+        # Stamp the status transition with the server's clock
         if status == "picked_up":
-            update_data["pickup_at"] = datetime.utcnow()
+            update["$currentDate"] = {"pickup_at": True}
         elif status == "delivered":
-            update_data["delivered_at"] = datetime.utcnow()
+            update["$currentDate"] = {"delivered_at": True}
         
         result = await self.deliveries.find_one_and_update(
             {
                 "_id": ObjectId(delivery_id),
-                "driver_id": ObjectId(driver_id)
+                "driver_id": driver_id
             },
-            {"$set": update_data},
+            update,
+            projection=_DELIVERY_PROJECTION,
             return_document=True
         )
         
         if result:
-            result["id"] = str(result["_id"])
-            result["order_id"] = str(result["order_id"])
-            result["driver_id"] = str(result["driver_id"])
-            del result["_id"]
-            
             # Update order status
             order_status_map = {
                 "picked_up": "in_transit",
@@ -186,16 +285,17 @@ class DeliveryService:
                 "delivered": "delivered"
             }
             
+            # The response doesn't depend on this write, so don't hold the driver on it.
+            # It isn't ordered against later writes; the order service also follows
+            # delivery state through the event bus.
             if status in order_status_map:
-                await self.orders.update_one(
+                _safe_task(self.orders.update_one(
                     {"_id": ObjectId(result["order_id"])},
                     {
-                        "$set": {
-                            "status": order_status_map[status],
-                            "updated_at": datetime.utcnow()
-                        }
+                        "$set": {"status": order_status_map[status]},
+                        "$currentDate": {"updated_at": True}
                     }
-                )
+                ))
             
             logger.info(f"Delivery status updated: {delivery_id} -> {status}")
         
@@ -204,20 +304,30 @@ class DeliveryService:
     async def confirm_delivery(
         self, 
         delivery_id: str, 
-        driver_id: str,
+        driver_id: ObjectId,
         otp: str
     ) -> dict:
         """Confirm delivery with OTP"""
-        delivery = await self.deliveries.find_one({
-            "_id": ObjectId(delivery_id),
-            "driver_id": ObjectId(driver_id)
-        })
+        # Read the delivery and its order's OTP in one round trip
+        pipeline = [
+            {"$match": {"_id": ObjectId(delivery_id), "driver_id": driver_id}},
+            {"$lookup": {
+                "from": "orders",
+                "localField": "order_id",
+                "foreignField": "_id",
+                "as": "order",
+                "pipeline": [{"$project": {"otp_for_delivery": 1}}]
+            }},
+            {"$project": {"order_id": 1, "order": {"$arrayElemAt": ["$order", 0]}}}
+        ]
+        
+        results = await (await self.deliveries.aggregate(pipeline)).to_list(1)
         
-        if not delivery:
+        if not results:
             return {"success": False, "message": "Delivery not found"}
         
-        # Get order to verify OTP
-        order = await self.orders.find_one({"_id": delivery["order_id"]})
+        delivery = results[0]
+        order = delivery.get("order")
         
         if not order:
             return {"success": False, "message": "Order not found"}
@@ -225,8 +335,19 @@ class DeliveryService:
         if order.get("otp_for_delivery") != otp:
             return {"success": False, "message": "Invalid OTP"}
         
-        # Update delivery and order status
-        await self.update_status(delivery_id, driver_id, "delivered")
+        result = await self.deliveries.update_one(
+            {"_id": delivery["_id"], "driver_id": driver_id},
+            {"$set": {"status": "delivered"}, "$currentDate": {"delivered_at": True}}
+        )
+        
+        if not result.matched_count:
+            return {"success": False, "message": "Delivery not found"}
+        
+        # The response doesn't depend on the order write, so don't wait for it
+        _safe_task(self.orders.update_one(
+            {"_id": delivery["order_id"]},
+            {"$set": {"status": "delivered"}, "$currentDate": {"updated_at": True}}
+        ))
         
         logger.info(f"Delivery confirmed with OTP: {delivery_id}")
         
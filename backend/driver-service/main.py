@@ -4,6 +4,7 @@ Driver Service - FastAPI Application
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 import logging
 
@@ -34,7 +35,8 @@ app = FastAPI(
     title="MedAssist Driver Service",
     description="Driver management service for MedAssist platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
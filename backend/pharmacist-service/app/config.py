@@ -36,3 +36,9 @@ def get_settings():
 
 
 settings = get_settings()
+
+# Hot-path JWT settings captured once
+JWT_SECRET = settings.jwt_secret
+JWT_ALGO = settings.jwt_algorithm
+JWT_ISSUER = settings.jwt_issuer
+JWT_AUDIENCE = settings.jwt_audience
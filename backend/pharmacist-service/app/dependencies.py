@@ -4,11 +4,18 @@ Dependencies for Pharmacist Service
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from bson import ObjectId
+from bson.errors import InvalidId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+import redis.asyncio as aioredis
+import asyncio
 import jwt
 import logging
 
-from app.config import settings
+from app.config import settings, JWT_SECRET, JWT_ALGO, JWT_ISSUER, JWT_AUDIENCE
+from app.services.inventory_service import InventoryService
+from app.services.order_service import OrderService
 
 logger = logging.getLogger(__name__)
 
@@ -18,22 +25,73 @@ security = HTTPBearer()
 # Database clients
 _mongo_client = None
 _db = None
+_redis = None
+_index_task = None
+_order_service = None
+_inventory_service = None
+
+
+async def ensure_indexes(db):
+    """Create indexes backing the order, inventory and pharmacy queries"""
+    try:
+        # Trailing _id keeps the keyset (created_at, _id) sort index-backed
+        await db.orders.create_index([
+            ("pharmacy_id", ASCENDING), ("status", ASCENDING),
+            ("created_at", DESCENDING), ("_id", DESCENDING)
+        ])
+        await db.orders.create_index([
+            ("pharmacy_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)
+        ])
+        await db.inventory.create_index([
+            ("pharmacy_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)
+        ])
+        # Same spec as the user-order-service Pharmacy model, so whichever service starts
+        # first builds it and the other's create is a no-op
+        await db.pharmacies.create_index("pharmacist_user_id")
+        logger.info("MongoDB indexes ensured")
+    except Exception as e:
+        logger.error(f"Failed to create MongoDB indexes: {str(e)}")
 
 
 async def connect_db():
-    """Connect to MongoDB"""
-    global _mongo_client, _db
-    _mongo_client = AsyncIOMotorClient(settings.mongodb_uri)
+    """Connect to MongoDB and Redis"""
+    global _mongo_client, _db, _redis, _index_task, _order_service, _inventory_service
+    _mongo_client = AsyncIOMotorClient(
+        settings.mongodb_uri,
+        maxPoolSize=50,
+        minPoolSize=5,
+        serverSelectionTimeoutMS=5000,
+        waitQueueTimeoutMS=2000,
+        maxIdleTimeMS=60000
+    )
     _db = _mongo_client.get_default_database()
+    _order_service = OrderService(_db)
+    _inventory_service = InventoryService(_db)
+    
+    # Build indexes in the background so startup isn't blocked
+    _index_task = asyncio.create_task(ensure_indexes(_db))
     logger.info("Connected to MongoDB")
+    
+    # Redis only backs caches here, so fail fast and fall through to MongoDB
+    _redis = aioredis.from_url(
+        settings.redis_uri,
+        socket_connect_timeout=1,
+        socket_timeout=1
+    )
+    logger.info("Connected to Redis")
 
 
 async def disconnect_db():
-    """Disconnect from MongoDB"""
-    global _mongo_client
+    """Disconnect from MongoDB and Redis"""
+    global _mongo_client, _redis
+    if _index_task and not _index_task.done():
+        _index_task.cancel()
     if _mongo_client:
         _mongo_client.close()
         logger.info("Disconnected from MongoDB")
+    if _redis:
+        await _redis.aclose()
+        logger.info("Disconnected from Redis")
 
 
 def get_database():
@@ -41,6 +99,33 @@ def get_database():
     return _db
 
 
+def get_redis():
+    """Get Redis client"""
+    return _redis
+
+
+# Async so FastAPI resolves them on the loop instead of a threadpool worker
+async def get_order_service() -> OrderService:
+    """Get the shared order service instance"""
+    return _order_service
+
+
+async def get_inventory_service() -> InventoryService:
+    """Get the shared inventory service instance"""
+    return _inventory_service
+
+
+def parse_object_id(value: str, name: str = "id") -> ObjectId:
+    """Parse a path id, rejecting malformed ones before they reach MongoDB"""
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid {name}"
+        )
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
@@ -50,10 +135,10 @@ async def get_current_user(
     try:
         payload = jwt.decode(
             token,
-            settings.jwt_secret,
-            algorithms=[settings.jwt_algorithm],
-            issuer=settings.jwt_issuer,
-            audience=settings.jwt_audience
+            JWT_SECRET,
+            algorithms=[JWT_ALGO],
+            issuer=JWT_ISSUER,
+            audience=JWT_AUDIENCE
         )
         
         if payload.get("type") != "access":
@@ -84,4 +169,8 @@ async def require_pharmacist(user: dict = Depends(get_current_user)) -> dict:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Pharmacist access required"
         )
+    
+    # Parse the subject once for every downstream query in this request
+    user["_sub_oid"] = ObjectId(user["sub"])
+    
     return user
@@ -2,8 +2,8 @@
 Order models for Pharmacist Service
 """
 
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, StringConstraints
+from typing import Annotated, List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -45,3 +45,10 @@ class OrderResponse(BaseModel):
 
 class DeclineOrderRequest(BaseModel):
     reason: Optional[str] = None
+
+
+class BulkAcceptOrdersRequest(BaseModel):
+    order_ids: List[Annotated[str, StringConstraints(pattern=r"^[0-9a-fA-F]{24}$")]] = Field(
+        min_length=1,
+        max_length=100
+    )
@@ -3,73 +3,95 @@ Inventory Router for Pharmacist Service
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import Response
+from bson import ObjectId
 from typing import Optional
+import orjson
 
-from app.dependencies import require_pharmacist, get_database
+from app.dependencies import require_pharmacist, get_redis, get_inventory_service, parse_object_id
 from app.models.inventory import InventoryItemCreate, InventoryItemUpdate, InventoryItemResponse
 from app.services.inventory_service import InventoryService
+from app.services.page_cache import get_cached_page, cache_page, invalidate_pages
 
 router = APIRouter()
 
 
-async def get_pharmacy_id(user: dict = Depends(require_pharmacist)) -> str:
+async def get_item_oid(item_id: str) -> ObjectId:
+    """Validate the item_id path param"""
+    return parse_object_id(item_id, "inventory item id")
+
+
+async def get_pharmacy_id(
+    user: dict = Depends(require_pharmacist),
+    service: InventoryService = Depends(get_inventory_service)
+) -> str:
     """Get pharmacy ID for the authenticated pharmacist"""
-    db = get_database()
-    service = InventoryService(db)
-    pharmacy = await service.get_pharmacy_for_user(user["sub"])
+    pharmacy_id = await service.get_pharmacy_id_for_user(user["_sub_oid"])
     
-    if not pharmacy:
+    if not pharmacy_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pharmacy not found for this user"
         )
     
-    return str(pharmacy["_id"])
+    return pharmacy_id
 
 
-@router.get("/inventory")
+@router.get("/inventory", response_model=None)
 async def list_inventory(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    cursor: Optional[str] = None,
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: InventoryService = Depends(get_inventory_service)
 ):
     """List inventory items"""
-    db = get_database()
-    service = InventoryService(db)
+    redis = get_redis()
+    
+    # List bodies are serialized once and returned as-is, skipping jsonable_encoder
+    cached = await get_cached_page(redis, "inventory", pharmacy_id, page, size, cursor)
+    if cached:
+        return Response(content=cached, media_type="application/json")
+    
+    try:
+        result = await service.get_inventory(pharmacy_id, page, size, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    result = await service.get_inventory(pharmacy_id, page, size)
+    body = orjson.dumps({"success": True, "data": result}, default=str)
+    await cache_page(redis, "inventory", pharmacy_id, body, page, size, cursor)
     
-    return {"success": True, "data": result}
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/inventory", status_code=status.HTTP_201_CREATED)
 async def add_inventory_item(
     item: InventoryItemCreate,
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: InventoryService = Depends(get_inventory_service)
 ):
     """Add new inventory item"""
-    db = get_database()
-    service = InventoryService(db)
-    
     created_item = await service.add_item(pharmacy_id, item.model_dump())
+    await invalidate_pages(get_redis(), "inventory", pharmacy_id)
     
     return {"success": True, "data": {"item": created_item}}
 
 
 @router.put("/inventory/{item_id}")
 async def update_inventory_item(
-    item_id: str,
     item: InventoryItemUpdate,
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    item_id: ObjectId = Depends(get_item_oid),
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: InventoryService = Depends(get_inventory_service)
 ):
     """Update inventory item"""
-    db = get_database()
-    service = InventoryService(db)
-    
     updated_item = await service.update_item(
         item_id, 
         pharmacy_id, 
-        item.model_dump(exclude_unset=True)
+        item.model_dump(exclude_none=True)
     )
     
     if not updated_item:
@@ -78,18 +100,18 @@ async def update_inventory_item(
             detail="Inventory item not found"
         )
     
+    await invalidate_pages(get_redis(), "inventory", pharmacy_id)
+    
     return {"success": True, "data": {"item": updated_item}}
 
 
 @router.delete("/inventory/{item_id}")
 async def delete_inventory_item(
-    item_id: str,
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    item_id: ObjectId = Depends(get_item_oid),
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: InventoryService = Depends(get_inventory_service)
 ):
     """Delete inventory item"""
-    db = get_database()
-    service = InventoryService(db)
-    
     deleted = await service.delete_item(item_id, pharmacy_id)
     
     if not deleted:
@@ -98,4 +120,6 @@ async def delete_inventory_item(
             detail="Inventory item not found"
         )
     
+    await invalidate_pages(get_redis(), "inventory", pharmacy_id)
+    
     return {"success": True, "message": "Item deleted successfully"}
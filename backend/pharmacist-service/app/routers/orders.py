@@ -3,76 +3,148 @@ Orders Router for Pharmacist Service
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Optional
+from fastapi.responses import ORJSONResponse, Response
+from bson import ObjectId
+from typing import Optional, Union
+import orjson
 
-from app.dependencies import require_pharmacist, get_database
-from app.models.orders import DeclineOrderRequest
+from app.dependencies import (
+    require_pharmacist,
+    get_redis,
+    get_order_service,
+    get_inventory_service,
+    parse_object_id
+)
+from app.models.orders import DeclineOrderRequest, BulkAcceptOrdersRequest
 from app.services.order_service import OrderService
 from app.services.inventory_service import InventoryService
+from app.services.cache import cache_get, cache_set, cache_delete
+from app.services.page_cache import get_cached_page, cache_page, invalidate_pages
 
 router = APIRouter()
 
+# Short enough that a status change made elsewhere shows up quickly
+ORDER_CACHE_TTL = 30
 
-async def get_pharmacy_id(user: dict = Depends(require_pharmacist)) -> str:
+
+def _order_cache_key(order_id: Union[ObjectId, str], pharmacy_id: str) -> str:
+    return f"order:{pharmacy_id}:{order_id}"
+
+
+async def get_order_oid(order_id: str) -> ObjectId:
+    """Validate the order_id path param"""
+    return parse_object_id(order_id, "order id")
+
+
+async def get_pharmacy_id(
+    user: dict = Depends(require_pharmacist),
+    service: InventoryService = Depends(get_inventory_service)
+) -> str:
     """Get pharmacy ID for the authenticated pharmacist"""
-    db = get_database()
-    service = InventoryService(db)
-    pharmacy = await service.get_pharmacy_for_user(user["sub"])
+    pharmacy_id = await service.get_pharmacy_id_for_user(user["_sub_oid"])
     
-    if not pharmacy:
+    if not pharmacy_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pharmacy not found for this user"
         )
     
-    return str(pharmacy["_id"])
+    return pharmacy_id
 
 
-@router.get("/orders")
+@router.get("/orders", response_model=None)
 async def list_orders(
     status: Optional[str] = None,
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    cursor: Optional[str] = None,
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: OrderService = Depends(get_order_service)
 ):
     """List orders for the pharmacy"""
-    db = get_database()
-    service = OrderService(db)
+    redis = get_redis()
+    
+    # List bodies are serialized once and returned as-is, skipping jsonable_encoder
+    cached = await get_cached_page(redis, "orders", pharmacy_id, status, page, size, cursor)
+    if cached:
+        return Response(content=cached, media_type="application/json")
     
-    result = await service.get_orders(pharmacy_id, status, page, size)
+    try:
+        result = await service.get_orders(pharmacy_id, status, page, size, cursor)
+    except ValueError as e:
+        # The status query param shadows fastapi.status here
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"success": True, "data": result}
+    body = orjson.dumps({"success": True, "data": result}, default=str)
+    await cache_page(redis, "orders", pharmacy_id, body, status, page, size, cursor)
+    
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/orders/bulk-accept", response_model=None)
+async def accept_orders_bulk(
+    request: BulkAcceptOrdersRequest,
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: OrderService = Depends(get_order_service)
+):
+    """Accept several incoming orders at once"""
+    result = await service.accept_orders(request.order_ids, pharmacy_id)
+    
+    redis = get_redis()
+    if result["accepted"]:
+        await cache_delete(redis, *(_order_cache_key(order_id, pharmacy_id) for order_id in result["accepted"]))
+        await invalidate_pages(redis, "orders", pharmacy_id)
+    
+    return ORJSONResponse({
+        "success": True,
+        "data": result,
+        "message": f"{result['accepted_count']} of {result['requested_count']} orders accepted"
+    })
 
 
-@router.get("/orders/{order_id}")
+@router.get("/orders/{order_id}", response_model=None)
 async def get_order(
-    order_id: str,
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    order_id: ObjectId = Depends(get_order_oid),
+    expand: Optional[str] = Query(None, pattern="^medicines$"),
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: OrderService = Depends(get_order_service)
 ):
-    """Get order details"""
-    db = get_database()
-    service = OrderService(db)
-    
-    order = await service.get_order(order_id, pharmacy_id)
-    
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Order not found"
-        )
-    
-    return {"success": True, "data": {"order": order}}
+    """Get order details, optionally with each item's medicine inlined"""
+    redis = get_redis()
+    cache_key = _order_cache_key(order_id, pharmacy_id)
+    
+    cached = await cache_get(redis, cache_key)
+    if cached and expand is None:
+        return Response(content=cached, media_type="application/json")
+    
+    if cached:
+        result = orjson.loads(cached)
+    else:
+        order = await service.get_order(order_id, pharmacy_id)
+        
+        if not order:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Order not found"
+            )
+        
+        result = {"success": True, "data": {"order": order}}
+        await cache_set(redis, cache_key, orjson.dumps(result, default=str), ORDER_CACHE_TTL)
+    
+    # The cache holds the plain order; medicines are joined per request
+    if expand == "medicines":
+        await service.expand_medicines([result["data"]["order"]])
+    
+    return ORJSONResponse(result)
 
 
-@router.post("/orders/{order_id}/accept")
+@router.post("/orders/{order_id}/accept", response_model=None)
 async def accept_order(
-    order_id: str,
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    order_id: ObjectId = Depends(get_order_oid),
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: OrderService = Depends(get_order_service)
 ):
     """Accept an incoming order"""
-    db = get_database()
-    service = OrderService(db)
-    
     order = await service.accept_order(order_id, pharmacy_id)
     
     if not order:
@@ -81,19 +153,21 @@ async def accept_order(
             detail="Cannot accept order. Order may not exist or is not in 'created' status."
         )
     
-    return {"success": True, "data": {"order": order}, "message": "Order accepted"}
+    redis = get_redis()
+    await cache_delete(redis, _order_cache_key(order_id, pharmacy_id))
+    await invalidate_pages(redis, "orders", pharmacy_id)
+    
+    return ORJSONResponse({"success": True, "data": {"order": order}, "message": "Order accepted"})
 
 
-@router.post("/orders/{order_id}/decline")
+@router.post("/orders/{order_id}/decline", response_model=None)
 async def decline_order(
-    order_id: str,
+    order_id: ObjectId = Depends(get_order_oid),
     request: DeclineOrderRequest = None,
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: OrderService = Depends(get_order_service)
 ):
     """Decline an incoming order"""
-    db = get_database()
-    service = OrderService(db)
-    
     reason = request.reason if request else None
     order = await service.decline_order(order_id, pharmacy_id, reason)
     
@@ -103,18 +177,20 @@ async def decline_order(
             detail="Cannot decline order. Order may not exist or is not in 'created' status."
         )
     
-    return {"success": True, "data": {"order": order}, "message": "Order declined"}
+    redis = get_redis()
+    await cache_delete(redis, _order_cache_key(order_id, pharmacy_id))
+    await invalidate_pages(redis, "orders", pharmacy_id)
+    
+    return ORJSONResponse({"success": True, "data": {"order": order}, "message": "Order declined"})
 
 
-@router.post("/orders/{order_id}/prepared")
+@router.post("/orders/{order_id}/prepared", response_model=None)
 async def mark_order_prepared(
-    order_id: str,
-    pharmacy_id: str = Depends(get_pharmacy_id)
+    order_id: ObjectId = Depends(get_order_oid),
+    pharmacy_id: str = Depends(get_pharmacy_id),
+    service: OrderService = Depends(get_order_service)
 ):
     """Mark order as prepared for pickup"""
-    db = get_database()
-    service = OrderService(db)
-    
     order = await service.mark_prepared(order_id, pharmacy_id)
     
     if not order:
@@ -123,4 +199,12 @@ async def mark_order_prepared(
             detail="Cannot mark order as prepared. Order may not exist or is not in 'accepted_by_pharmacy' status."
         )
     
-    return {"success": True, "data": {"order": order}, "message": "Order marked as prepared"}
+    redis = get_redis()
+    await cache_delete(redis, _order_cache_key(order_id, pharmacy_id))
+    await invalidate_pages(redis, "orders", pharmacy_id)
+    
+    return ORJSONResponse({
+        "success": True,
+        "data": {"order": order},
+        "message": "Order marked as prepared"
+    })
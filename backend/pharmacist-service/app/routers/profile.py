@@ -3,23 +3,57 @@ Profile Router for Pharmacist Service
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from bson import ObjectId
+from fastapi.responses import ORJSONResponse, Response
+import asyncio
+import orjson
 
-from app.dependencies import require_pharmacist, get_database
+from app.dependencies import require_pharmacist, get_database, get_redis
 from app.models.pharmacy import PharmacyProfileUpdate
+from app.services.cache import cache_get, cache_set, cache_delete
+from app.services.inventory_service import invalidate_pharmacy_id
 
 router = APIRouter()
 
+# Profile responses are read on every dashboard load and rarely change
+PROFILE_CACHE_TTL = 60
 
-@router.get("/profile")
+# Only the fields the profile responses return; user documents also hold credentials
+_USER_PROJECTION = {"name": 1, "email": 1, "phone": 1, "roles": 1}
+_PHARMACY_PROJECTION = {
+    "name": 1,
+    "address": 1,
+    "opening_hours": 1,
+    "contact_phone": 1,
+    "is_active": 1,
+    "rating": 1,
+    "rating_count": 1,
+    "created_at": 1
+}
+
+
+def _profile_cache_key(user_id: str) -> str:
+    return f"profile:{user_id}"
+
+
+@router.get("/profile", response_model=None)
 async def get_profile(user: dict = Depends(require_pharmacist)):
     """Get pharmacist profile and pharmacy details"""
     db = get_database()
+    redis = get_redis()
     
-    # Get pharmacy for this pharmacist
-    pharmacy = await db.pharmacies.find_one({
-        "pharmacist_user_id": ObjectId(user["sub"])
-    })
+    cache_key = _profile_cache_key(user["sub"])
+    cached = await cache_get(redis, cache_key)
+    if cached:
+        return Response(content=cached, media_type="application/json")
+    
+    # Pharmacy and user lookups are independent, so run them together
+    pharmacy, user_doc = await asyncio.gather(
+        db.pharmacies.find_one(
+            {"pharmacist_user_id": user["_sub_oid"]},
+            projection=_PHARMACY_PROJECTION
+        ),
+        db.users.find_one({"_id": user["_sub_oid"]}, projection=_USER_PROJECTION)
+    )
     
     if not pharmacy:
         raise HTTPException(
@@ -27,10 +61,7 @@ async def get_profile(user: dict = Depends(require_pharmacist)):
             detail="Pharmacy not found for this user"
         )
     
-    # Get user details
-    user_doc = await db.users.find_one({"_id": ObjectId(user["sub"])})
-    
-    return {
+    result = {
         "success": True,
         "data": {
             "user": {
@@ -53,9 +84,14 @@ async def get_profile(user: dict = Depends(require_pharmacist)):
             }
         }
     }
+    
+    body = orjson.dumps(result, default=str)
+    await cache_set(redis, cache_key, body, PROFILE_CACHE_TTL)
+    
+    return Response(content=body, media_type="application/json")
 
 
-@router.put("/profile")
+@router.put("/profile", response_model=None)
 async def update_profile(
     update_data: PharmacyProfileUpdate,
     user: dict = Depends(require_pharmacist)
@@ -63,8 +99,7 @@ async def update_profile(
     """Update pharmacy profile"""
     db = get_database()
     
-    # Filter out None values
-    updates = {k: v for k, v in update_data.model_dump().items() if v is not None}
+    updates = update_data.model_dump(exclude_none=True)
     
     if not updates:
         raise HTTPException(
@@ -73,8 +108,9 @@ async def update_profile(
         )
     
     result = await db.pharmacies.find_one_and_update(
-        {"pharmacist_user_id": ObjectId(user["sub"])},
+        {"pharmacist_user_id": user["_sub_oid"]},
         {"$set": updates},
+        projection=_PHARMACY_PROJECTION,
         return_document=True
     )
     
@@ -84,7 +120,10 @@ async def update_profile(
             detail="Pharmacy not found for this user"
         )
     
-    return {
+    invalidate_pharmacy_id(user["_sub_oid"])
+    await cache_delete(get_redis(), _profile_cache_key(user["sub"]))
+    
+    return ORJSONResponse({
         "success": True,
         "data": {
             "pharmacy": {
@@ -99,4 +138,4 @@ async def update_profile(
             }
         },
         "message": "Profile updated successfully"
-    }
+    })
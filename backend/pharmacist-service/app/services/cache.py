@@ -0,0 +1,34 @@
+"""
+Best-effort Redis cache helpers for Pharmacist Service
+"""
+
+from redis.exceptions import RedisError
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def cache_get(redis, key: str) -> Optional[bytes]:
+    """Read a cached body, treating a Redis failure as a miss"""
+    try:
+        return await redis.get(key)
+    except RedisError as e:
+        logger.warning(f"Cache read failed for {key}: {str(e)}")
+        return None
+
+
+async def cache_set(redis, key: str, value: bytes, ttl: int) -> None:
+    """Cache a body, skipping it if Redis fails"""
+    try:
+        await redis.set(key, value, ex=ttl)
+    except RedisError as e:
+        logger.warning(f"Cache write failed for {key}: {str(e)}")
+
+
+async def cache_delete(redis, *keys: str) -> None:
+    """Invalidate cached bodies; a failure is logged since the entries still expire on their own"""
+    try:
+        await redis.delete(*keys)
+    except RedisError as e:
+        logger.error(f"Cache invalidation failed for {', '.join(keys)}: {str(e)}")
@@ -5,46 +5,123 @@ Inventory Service for Pharmacist
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
+from cachetools import TTLCache
 from typing import Optional, List
+import asyncio
 import logging
 
+from app.services.pagination import (
+    KEYSET_SORT,
+    keyset_filter,
+    next_cursor,
+    cached_total,
+    store_total,
+    invalidate_totals
+)
+
 logger = logging.getLogger(__name__)
 
+# Stages that stringify an inventory item's ObjectId fields server-side
+_STRINGIFY_IDS = [
+    {"$set": {
+        "id": {"$toString": "$_id"},
+        "pharmacy_id": {"$toString": "$pharmacy_id"},
+        "medicine_id": {"$toString": "$medicine_id"}
+    }},
+    {"$unset": "_id"}
+]
+
+# Pharmacist user id -> pharmacy id, so order/inventory requests skip the pharmacy lookup
+_pharmacy_id_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+
+
+def invalidate_pharmacy_id(user_id: ObjectId) -> None:
+    """Drop the cached pharmacy id for a pharmacist user"""
+    _pharmacy_id_cache.pop(user_id, None)
+
 
 class InventoryService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.collection = db.inventory
     
-    async def get_pharmacy_for_user(self, user_id: str) -> Optional[dict]:
+    async def get_pharmacy_for_user(
+        self,
+        user_id: ObjectId,
+        projection: Optional[dict] = None
+    ) -> Optional[dict]:
         """Get pharmacy for the pharmacist user"""
-        pharmacy = await self.db.pharmacies.find_one({
-            "pharmacist_user_id": ObjectId(user_id)
-        })
+        pharmacy = await self.db.pharmacies.find_one(
+            {"pharmacist_user_id": user_id},
+            projection=projection
+        )
         return pharmacy
     
+    async def get_pharmacy_id_for_user(self, user_id: ObjectId) -> Optional[str]:
+        """Get the pharmacy id for the pharmacist user, cached for a few minutes"""
+        pharmacy_id = _pharmacy_id_cache.get(user_id)
+        if pharmacy_id:
+            return pharmacy_id
+        
+        pharmacy = await self.get_pharmacy_for_user(user_id, projection={"_id": 1})
+        if not pharmacy:
+            return None
+        
+        pharmacy_id = str(pharmacy["_id"])
+        _pharmacy_id_cache[user_id] = pharmacy_id
+        return pharmacy_id
+    
     async def get_inventory(
         self, 
         pharmacy_id: str, 
         page: int = 1, 
-        size: int = 20
+        size: int = 20,
+        cursor: Optional[str] = None
     ) -> dict:
         """Get inventory for a pharmacy"""
         query = {"pharmacy_id": ObjectId(pharmacy_id)}
         
-        skip = (page - 1) * size
-        
-        cursor = self.collection.find(query).skip(skip).limit(size).sort("created_at", -1)
-        items = await cursor.to_list(length=size)
-        
-        # Convert ObjectIds to strings
-        for item in items:
-            item["id"] = str(item["_id"])
-            item["pharmacy_id"] = str(item["pharmacy_id"])
-            item["medicine_id"] = str(item["medicine_id"])
-            del item["_id"]
-        
-        total = await self.collection.count_documents(query)
+        total = cached_total("inventory", pharmacy_id, None)
+        
+        if cursor or total is not None:
+            # Keyset pages cost O(size) however deep the client pages, and once the
+            # total is known neither kind of page needs to count again
+            pipeline = [
+                {"$match": {**query, **keyset_filter(cursor)} if cursor else query},
+                {"$sort": dict(KEYSET_SORT)}
+            ]
+            
+            if not cursor:
+                pipeline.append({"$skip": (page - 1) * size})
+            
+            pipeline += [{"$limit": size}, *_STRINGIFY_IDS]
+            page_docs = self.collection.aggregate(pipeline).to_list(length=size)
+            
+            if total is None:
+                items, total = await asyncio.gather(
+                    page_docs,
+                    self.collection.count_documents(query)
+                )
+                store_total("inventory", pharmacy_id, None, total)
+            else:
+                items = await page_docs
+        else:
+            skip = (page - 1) * size
+            
+            # Page and total count in one round trip
+            pipeline = [
+                {"$match": query},
+                {"$sort": dict(KEYSET_SORT)},
+                {"$facet": {
+                    "items": [{"$skip": skip}, {"$limit": size}, *_STRINGIFY_IDS],
+                    "total": [{"$count": "n"}]
+                }}
+            ]
+            
+            doc = (await self.collection.aggregate(pipeline).to_list(1))[0]
+            items = doc["items"]
+            total = doc["total"][0]["n"] if doc["total"] else 0
+            store_total("inventory", pharmacy_id, None, total)
         
         return {
             "items": items,
@@ -52,7 +129,8 @@ class InventoryService:
                 "page": page,
                 "size": size,
                 "total": total,
-                "pages": (total + size - 1) // size
+                "pages": (total + size - 1) // size,
+                "next_cursor": next_cursor(items, size)
             }
         }
     
@@ -76,19 +154,19 @@ class InventoryService:
         doc["pharmacy_id"] = str(doc["pharmacy_id"])
         doc["medicine_id"] = str(doc["medicine_id"])
         
+        invalidate_totals("inventory", pharmacy_id)
         logger.info(f"Inventory item added: {doc['id']}")
         
         return doc
     
     async def update_item(
         self, 
-        item_id: str, 
+        item_id: ObjectId, 
         pharmacy_id: str, 
         update_data: dict
     ) -> Optional[dict]:
-        """Update inventory item"""
-        # Filter out None values
-        updates = {k: v for k, v in update_data.items() if v is not None}
+        """Update inventory item from a model dump that already excludes None fields"""
+        updates = dict(update_data)
         
         if "expiry_date" in updates:
             updates["expiry_date"] = datetime.combine(
@@ -101,7 +179,7 @@ class InventoryService:
         
         result = await self.collection.find_one_and_update(
             {
-                "_id": ObjectId(item_id),
+                "_id": item_id,
                 "pharmacy_id": ObjectId(pharmacy_id)
             },
             {"$set": updates},
@@ -117,22 +195,23 @@ class InventoryService:
         
         return result
     
-    async def delete_item(self, item_id: str, pharmacy_id: str) -> bool:
+    async def delete_item(self, item_id: ObjectId, pharmacy_id: str) -> bool:
         """Delete inventory item"""
         result = await self.collection.delete_one({
-            "_id": ObjectId(item_id),
+            "_id": item_id,
             "pharmacy_id": ObjectId(pharmacy_id)
         })
         
         if result.deleted_count > 0:
+            invalidate_totals("inventory", pharmacy_id)
             logger.info(f"Inventory item deleted: {item_id}")
             return True
         return False
     
-    async def get_item(self, item_id: str, pharmacy_id: str) -> Optional[dict]:
+    async def get_item(self, item_id: ObjectId, pharmacy_id: str) -> Optional[dict]:
         """Get single inventory item"""
         item = await self.collection.find_one({
-            "_id": ObjectId(item_id),
+            "_id": item_id,
             "pharmacy_id": ObjectId(pharmacy_id)
         })
         
@@ -5,11 +5,56 @@ Order Service for Pharmacist
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+import asyncio
 import logging
 
+from app.services.pagination import (
+    KEYSET_SORT,
+    keyset_filter,
+    next_cursor,
+    cached_total,
+    store_total,
+    invalidate_totals
+)
+
 logger = logging.getLogger(__name__)
 
+# Fields the pharmacist never sees: the customer's delivery OTP and write bookkeeping
+_HIDDEN_FIELDS = {"$unset": ["otp_for_delivery", "idempotency_key", "accept_batch_id", "__v"]}
+
+# Stages that stringify an order's ObjectId fields server-side, leaving a flat dict
+_STRINGIFY_IDS = [
+    {"$set": {
+        "id": {"$toString": "$_id"},
+        "user_id": {"$toString": "$user_id"},
+        "pharmacy_id": {"$toString": "$pharmacy_id"},
+        "delivery_id": {"$cond": [
+            {"$ifNull": ["$delivery_id", False]},
+            {"$toString": "$delivery_id"},
+            "$$REMOVE"
+        ]},
+        "items": {"$map": {
+            "input": {"$ifNull": ["$items", []]},
+            "as": "item",
+            "in": {"$mergeObjects": [
+                "$$item",
+                {"medicine_id": {"$toString": "$$item.medicine_id"}}
+            ]}
+        }}
+    }},
+    {"$unset": "_id"}
+]
+
+# Medicine fields inlined into order items on ?expand=medicines
+_MEDICINE_PROJECTION = {
+    "name": 1,
+    "brand": 1,
+    "strength": 1,
+    "dosage_form": 1,
+    "prescription_required": 1
+}
+
 
 class OrderService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -21,7 +66,8 @@ class OrderService:
         pharmacy_id: str, 
         status: Optional[str] = None,
         page: int = 1, 
-        size: int = 20
+        size: int = 20,
+        cursor: Optional[str] = None
     ) -> dict:
         """Get orders for a pharmacy"""
         query = {"pharmacy_id": ObjectId(pharmacy_id)}
@@ -29,24 +75,47 @@ class OrderService:
         if status:
             query["status"] = status
         
-        skip = (page - 1) * size
-        
-        cursor = self.collection.find(query).skip(skip).limit(size).sort("created_at", -1)
-        orders = await cursor.to_list(length=size)
-        
-        # Convert ObjectIds to strings
-        for order in orders:
-            order["id"] = str(order["_id"])
-            order["user_id"] = str(order["user_id"])
-            order["pharmacy_id"] = str(order["pharmacy_id"])
-            if order.get("delivery_id"):
-                order["delivery_id"] = str(order["delivery_id"])
-            for item in order.get("items", []):
-                if isinstance(item.get("medicine_id"), ObjectId):
-                    item["medicine_id"] = str(item["medicine_id"])
-            del order["_id"]
+        total = cached_total("orders", pharmacy_id, status)
         
-        total = await self.collection.count_documents(query)
+        if cursor or total is not None:
+            # Keyset pages cost O(size) however deep the client pages, and once the
+            # total is known neither kind of page needs to count again
+            pipeline = [
+                {"$match": {**query, **keyset_filter(cursor)} if cursor else query},
+                {"$sort": dict(KEYSET_SORT)}
+            ]
+            
+            if not cursor:
+                pipeline.append({"$skip": (page - 1) * size})
+            
+            pipeline += [{"$limit": size}, _HIDDEN_FIELDS, *_STRINGIFY_IDS]
+            page_docs = self.collection.aggregate(pipeline).to_list(length=size)
+            
+            if total is None:
+                orders, total = await asyncio.gather(
+                    page_docs,
+                    self.collection.count_documents(query)
+                )
+                store_total("orders", pharmacy_id, status, total)
+            else:
+                orders = await page_docs
+        else:
+            skip = (page - 1) * size
+            
+            # Page and total count in one round trip
+            pipeline = [
+                {"$match": query},
+                {"$sort": dict(KEYSET_SORT)},
+                {"$facet": {
+                    "items": [{"$skip": skip}, {"$limit": size}, _HIDDEN_FIELDS, *_STRINGIFY_IDS],
+                    "total": [{"$count": "n"}]
+                }}
+            ]
+            
+            doc = (await self.collection.aggregate(pipeline).to_list(1))[0]
+            orders = doc["items"]
+            total = doc["total"][0]["n"] if doc["total"] else 0
+            store_total("orders", pharmacy_id, status, total)
         
         return {
             "orders": orders,
@@ -54,59 +123,140 @@ class OrderService:
                 "page": page,
                 "size": size,
                 "total": total,
-                "pages": (total + size - 1) // size
+                "pages": (total + size - 1) // size,
+                "next_cursor": next_cursor(orders, size)
             }
         }
     
-    async def get_order(self, order_id: str, pharmacy_id: str) -> Optional[dict]:
+    async def get_order(self, order_id: ObjectId, pharmacy_id: str) -> Optional[dict]:
         """Get single order"""
-        order = await self.collection.find_one({
-            "_id": ObjectId(order_id),
-            "pharmacy_id": ObjectId(pharmacy_id)
-        })
+        pipeline = [
+            {"$match": {
+                "_id": order_id,
+                "pharmacy_id": ObjectId(pharmacy_id)
+            }},
+            _HIDDEN_FIELDS,
+            *_STRINGIFY_IDS
+        ]
         
-        if order:
-            order["id"] = str(order["_id"])
-            order["user_id"] = str(order["user_id"])
-            order["pharmacy_id"] = str(order["pharmacy_id"])
-            if order.get("delivery_id"):
-                order["delivery_id"] = str(order["delivery_id"])
-            for item in order.get("items", []):
-                if isinstance(item.get("medicine_id"), ObjectId):
-                    item["medicine_id"] = str(item["medicine_id"])
-            del order["_id"]
+        orders = await self.collection.aggregate(pipeline).to_list(1)
         
-        return order
+        return orders[0] if orders else None
     
-    async def accept_order(self, order_id: str, pharmacy_id: str) -> Optional[dict]:
-        """Accept an order"""
-        result = await self.collection.find_one_and_update(
+    async def batch_get_medicines(self, medicine_ids: List[ObjectId]) -> dict:
+        """Fetch several medicines in one query, keyed by their string id"""
+        medicines = await self.db.medicines.find(
+            {"_id": {"$in": medicine_ids}},
+            projection=_MEDICINE_PROJECTION
+        ).to_list(length=len(medicine_ids))
+        
+        return {str(medicine.pop("_id")): medicine for medicine in medicines}
+    
+    async def expand_medicines(self, orders: List[dict]) -> None:
+        """Inline each item's medicine details into already stringified orders"""
+        medicine_ids = {
+            item["medicine_id"]
+            for order in orders
+            for item in order.get("items", [])
+        }
+        
+        if not medicine_ids:
+            return
+        
+        # One $in query for every item instead of a lookup per medicine
+        medicines = await self.batch_get_medicines([ObjectId(i) for i in medicine_ids])
+        
+        for order in orders:
+            for item in order.get("items", []):
+                item["medicine"] = medicines.get(item["medicine_id"])
+    
+    async def _transition(
+        self,
+        order_id: ObjectId,
+        pharmacy_id: str,
+        from_status: str,
+        update_data: dict
+    ) -> Optional[dict]:
+        """Move an order out of from_status, returning its new state or None if it didn't match"""
+        result = await self.collection.update_one(
             {
-                "_id": ObjectId(order_id),
+                "_id": order_id,
                 "pharmacy_id": ObjectId(pharmacy_id),
-                "status": "created"
+                "status": from_status
             },
-            {
-                "$set": {
-                    "status": "accepted_by_pharmacy",
-                    "updated_at": datetime.utcnow()
-                }
-            },
-            return_document=True
+            {"$set": update_data}
         )
         
+        if not result.matched_count:
+            return None
+        
+        invalidate_totals("orders", pharmacy_id)
+        
+        # The write only touched these fields, so echo them instead of reading the order back
+        return {"id": str(order_id), "pharmacy_id": pharmacy_id, **update_data}
+    
+    async def accept_order(self, order_id: ObjectId, pharmacy_id: str) -> Optional[dict]:
+        """Accept an order"""
+        result = await self._transition(order_id, pharmacy_id, "created", {
+            "status": "accepted_by_pharmacy",
+            "updated_at": datetime.utcnow()
+        })
+        
         if result:
-            result["id"] = str(result["_id"])
-            result["user_id"] = str(result["user_id"])
-            result["pharmacy_id"] = str(result["pharmacy_id"])
-            del result["_id"]
             logger.info(f"Order accepted: {order_id}")
         
         return result
     
+    async def accept_orders(self, order_ids: List[str], pharmacy_id: str) -> dict:
+        """Accept several orders in one write"""
+        # Dedupe after parsing: ids differing only in hex case are the same order
+        ids = list(dict.fromkeys(ObjectId(order_id) for order_id in order_ids))
+        # Tags exactly the orders this call changes, unlike a timestamp that a
+        # concurrent accept in the same millisecond could share
+        batch_id = ObjectId()
+        
+        # Every order gets the same update, so one update_many covers the whole batch
+        result = await self.collection.update_many(
+            {
+                "_id": {"$in": ids},
+                "pharmacy_id": ObjectId(pharmacy_id),
+                "status": "created"
+            },
+            {"$set": {
+                "status": "accepted_by_pharmacy",
+                "updated_at": datetime.utcnow(),
+                "accept_batch_id": batch_id
+            }}
+        )
+        
+        if result.modified_count == len(ids):
+            accepted = [str(_id) for _id in ids]
+        else:
+            # Some orders didn't match; only the ones this write changed carry batch_id
+            docs = await self.collection.find(
+                {
+                    "_id": {"$in": ids},
+                    "pharmacy_id": ObjectId(pharmacy_id),
+                    "accept_batch_id": batch_id
+                },
+                projection={"_id": 1}
+            ).to_list(length=len(ids))
+            accepted = [str(doc["_id"]) for doc in docs]
+        
+        if accepted:
+            invalidate_totals("orders", pharmacy_id)
+        
+        logger.info(f"Orders accepted in bulk: {len(accepted)}/{len(ids)}")
+        
+        return {
+            "accepted": accepted,
+            "accepted_count": len(accepted),
+            "requested_count": len(ids)
+        }
+    
     async def decline_order(
         self, 
-        order_id: str, 
+        order_id: ObjectId, 
         pharmacy_id: str,
         reason: Optional[str] = None
     ) -> Optional[dict]:
@@ -119,49 +269,23 @@ class OrderService:
         if reason:
             update_data["cancellation_reason"] = reason
         
-        result = await self.collection.find_one_and_update(
-            {
-                "_id": ObjectId(order_id),
-                "pharmacy_id": ObjectId(pharmacy_id),
-                "status": "created"
-            },
-            {"$set": update_data},
-            return_document=True
-        )
+        result = await self._transition(order_id, pharmacy_id, "created", update_data)
         
         if result:
-            result["id"] = str(result["_id"])
-            result["user_id"] = str(result["user_id"])
-            result["pharmacy_id"] = str(result["pharmacy_id"])
-            del result["_id"]
             logger.info(f"Order declined: {order_id}")
             
             # TODO: Release reserved inventory
         
         return result
     
-    async def mark_prepared(self, order_id: str, pharmacy_id: str) -> Optional[dict]:
+    async def mark_prepared(self, order_id: ObjectId, pharmacy_id: str) -> Optional[dict]:
         """Mark order as prepared"""
-        result = await self.collection.find_one_and_update(
-            {
-                "_id": ObjectId(order_id),
-                "pharmacy_id": ObjectId(pharmacy_id),
-                "status": "accepted_by_pharmacy"
-            },
-            {
-                "$set": {
-                    "status": "prepared",
-                    "updated_at": datetime.utcnow()
-                }
-            },
-            return_document=True
-        )
+        result = await self._transition(order_id, pharmacy_id, "accepted_by_pharmacy", {
+            "status": "prepared",
+            "updated_at": datetime.utcnow()
+        })
         
         if result:
-            result["id"] = str(result["_id"])
-            result["user_id"] = str(result["user_id"])
-            result["pharmacy_id"] = str(result["pharmacy_id"])
-            del result["_id"]
             logger.info(f"Order marked as prepared: {order_id}")
         
         return result
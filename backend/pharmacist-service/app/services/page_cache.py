@@ -0,0 +1,58 @@
+"""
+Redis cache for paginated list responses
+"""
+
+from redis.exceptions import RedisError
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lists are polled by the dashboard; orders placed through the order service
+# only show up once this expires, so keep it short
+LIST_CACHE_TTL = 15
+
+
+def _pages_key(namespace: str, pharmacy_id: str) -> str:
+    return f"{namespace}:pages:{pharmacy_id}"
+
+
+def _page_field(*params) -> str:
+    return "|".join("" if p is None else str(p) for p in params)
+
+
+async def get_cached_page(redis, namespace: str, pharmacy_id: str, *params) -> Optional[bytes]:
+    """Return the cached JSON body of a list response for these query params, if any"""
+    try:
+        return await redis.hget(_pages_key(namespace, pharmacy_id), _page_field(*params))
+    except RedisError as e:
+        # Treat it as a miss so the list is served from MongoDB
+        logger.warning(f"Page cache read failed for {namespace}: {str(e)}")
+        return None
+
+
+async def cache_page(redis, namespace: str, pharmacy_id: str, body: bytes, *params) -> None:
+    """Cache a serialized list response under the pharmacy's page hash"""
+    key = _pages_key(namespace, pharmacy_id)
+    
+    # Every page of a pharmacy's list shares one hash so a write can drop them all at once.
+    # NX keeps the first page's TTL, so nothing in the hash outlives it.
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, _page_field(*params), body)
+            pipe.expire(key, LIST_CACHE_TTL, nx=True)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Page cache write failed for {key}: {str(e)}")
+
+
+async def invalidate_pages(redis, namespace: str, pharmacy_id: str) -> None:
+    """Drop every cached page of a pharmacy's list"""
+    key = _pages_key(namespace, pharmacy_id)
+    
+    # Callers invalidate after their write committed, so never fail the request here;
+    # the pages still expire within LIST_CACHE_TTL
+    try:
+        await redis.delete(key)
+    except RedisError as e:
+        logger.error(f"Page cache invalidation failed for {key}: {str(e)}")
@@ -0,0 +1,68 @@
+"""
+Keyset pagination helpers for Pharmacist Service
+"""
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from cachetools import TTLCache
+from datetime import datetime
+from typing import List, Optional
+import base64
+import binascii
+
+# Newest first, with _id breaking ties between documents created in the same millisecond
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+# (collection, pharmacy id) -> {status filter: total}, so deeper pages skip the count query
+_totals: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
+
+def encode_cursor(doc: dict) -> str:
+    """Encode a stringified document's sort keys as an opaque cursor"""
+    raw = f"{doc['created_at'].isoformat()}|{doc['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor into its (created_at, _id) sort keys"""
+    try:
+        created_at, _id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId):
+        raise ValueError("Invalid pagination cursor")
+
+
+def keyset_filter(cursor: str) -> dict:
+    """Filter matching documents that sort after the cursor"""
+    created_at, _id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": _id}}
+        ]
+    }
+
+
+def cached_total(namespace: str, pharmacy_id: str, status: Optional[str] = None) -> Optional[int]:
+    """Total for a pharmacy's list under a status filter, if counted recently"""
+    return _totals.get((namespace, pharmacy_id), {}).get(status)
+
+
+def store_total(namespace: str, pharmacy_id: str, status: Optional[str], total: int) -> None:
+    """Remember a freshly counted total; only call this after a real count so entries still expire"""
+    totals = _totals.get((namespace, pharmacy_id))
+    if totals is None:
+        totals = _totals[(namespace, pharmacy_id)] = {}
+    totals[status] = total
+
+
+def invalidate_totals(namespace: str, pharmacy_id: str) -> None:
+    """Drop every cached total of a pharmacy's list after a write that changes it"""
+    _totals.pop((namespace, pharmacy_id), None)
+
+
+def next_cursor(docs: List[dict], size: int) -> Optional[str]:
+    """Cursor for the page after docs, or None on the last page"""
+    if len(docs) < size:
+        return None
+    return encode_cursor(docs[-1])
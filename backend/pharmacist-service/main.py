@@ -4,8 +4,11 @@ Pharmacist Service - FastAPI Application
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 import logging
+import queue
 
 from app.config import settings
 from app.routers import inventory, orders, profile
@@ -16,25 +19,37 @@ logging.basicConfig(
     level=logging.INFO,
     format='{"timestamp":"%(asctime)s","service":"pharmacist-service","level":"%(levelname)s","message":"%(message)s"}'
 )
+
+# Hand records to a background thread so formatting and the stderr write
+# happen off the event loop; the listener owns the handler basicConfig made
+_log_queue = queue.Queue(-1)
+_root_logger = logging.getLogger()
+_log_listener = QueueListener(_log_queue, *_root_logger.handlers, respect_handler_level=True)
+_root_logger.handlers = [QueueHandler(_log_queue)]
+
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    _log_listener.start()
     logger.info("Starting pharmacist service")
     await connect_db()
     yield
     # Shutdown
     logger.info("Shutting down pharmacist service")
     await disconnect_db()
+    # Flushes anything still queued before the process exits
+    _log_listener.stop()
 
 
 app = FastAPI(
     title="MedAssist Pharmacist Service",
     description="Pharmacist management service for MedAssist platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware